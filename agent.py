@@ -7,25 +7,92 @@ Monitors system health and reports to central dashboard
 import os
 import sys
 import json
+import gzip
 import time
+import queue
 import socket
 import platform
 import threading
+import subprocess
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util import Retry
 from datetime import datetime
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 from health_report import HealthReporter
 from updater import AgentUpdater
 from config import Config
 
 class OSHealthAgent:
+    # Rotate the local report log once it grows past this size
+    MAX_LOCAL_LOG_BYTES = 10 * 1024 * 1024
+
     def __init__(self):
         self.config = Config()
         self.health_reporter = HealthReporter()
         self.updater = AgentUpdater()
         self.agent_id = self.get_agent_id()
-        self.running = False
-        
+        self._stop_event = threading.Event()
+        self.session = self.create_session()
+        self._local_log = self.open_local_log()
+        self._notify_q = queue.Queue()
+        notify_thread = threading.Thread(target=self._notify_loop)
+        notify_thread.daemon = True
+        notify_thread.start()
+
+    def open_local_log(self):
+        """Open the append-only local report log"""
+        return open(self.config.REPORTS_DIR / "reports.ndjson", 'a', buffering=1 << 16)
+
+    def create_session(self):
+        """Create a pooled HTTP session reused for all dashboard calls"""
+        session = requests.Session()
+        retry = Retry(
+            total=self.config.MAX_RETRIES,
+            backoff_factor=1,
+            status_forcelist=[502, 503, 504],
+            # urllib3 excludes POST by default, and the report upload is
+            # the only request this session makes; re-sending a report
+            # is harmless on the dashboard side
+            allowed_methods=None
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=4, max_retries=retry)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        session.headers.update({
+            'Content-Type': 'application/json',
+            'User-Agent': f'os-health-agent/{self.config.VERSION}'
+        })
+        return session
+
     def get_agent_id(self):
+        """Load the stable agent ID, generating and caching it on first run"""
+        id_file = self.config.DATA_DIR / "agent_id"
+
+        try:
+            agent_id = id_file.read_text().strip()
+            if agent_id:
+                return agent_id
+        except OSError:
+            pass
+
+        agent_id = self.generate_agent_id()
+
+        # Write atomically so a crash never leaves a truncated ID behind
+        try:
+            tmp_file = id_file.with_name("agent_id.tmp")
+            tmp_file.write_text(agent_id)
+            os.replace(tmp_file, id_file)
+        except OSError:
+            pass
+
+        return agent_id
+
+    def generate_agent_id(self):
         """Generate unique agent ID based on hostname and MAC address"""
         try:
             import uuid
@@ -41,43 +108,44 @@ class OSHealthAgent:
         print(f"📍 Agent ID: {self.agent_id}")
         print(f"🌐 Dashboard URL: {self.config.DASHBOARD_URL}")
         
-        self.running = True
-        
+        self._stop_event.clear()
+
         # Start update checker in background
         update_thread = threading.Thread(target=self.check_for_updates_loop)
         update_thread.daemon = True
         update_thread.start()
-        
+
         # Main monitoring loop
-        while self.running:
+        while not self._stop_event.is_set():
             try:
                 self.collect_and_send_report()
-                time.sleep(self.config.REPORT_INTERVAL)
+                self._stop_event.wait(self.config.REPORT_INTERVAL)
             except KeyboardInterrupt:
                 print("\n🛑 Agent stopped by user")
                 break
             except Exception as e:
                 print(f"❌ Error in main loop: {e}")
-                time.sleep(30)  # Wait before retry
+                self._stop_event.wait(30)  # Wait before retry
     
     def collect_and_send_report(self):
         """Collect system health data and send to dashboard"""
         try:
             # Generate health report
             report = self.health_reporter.generate_report()
-            
+
             # Add agent metadata
+            now = datetime.now()
             report['agent_id'] = self.agent_id
-            report['timestamp'] = datetime.now().isoformat()
+            report['timestamp'] = now.isoformat()
             report['agent_version'] = self.config.VERSION
-            
+
             # Send to dashboard
             self.send_to_dashboard(report)
-            
+
             # Save local copy
             self.save_local_report(report)
-            
-            print(f"✅ Health report sent at {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+
+            print(f"✅ Health report sent at {now.strftime('%Y-%m-%d %H:%M:%S')}")
             
         except Exception as e:
             print(f"❌ Error collecting/sending report: {e}")
@@ -85,10 +153,21 @@ class OSHealthAgent:
     def send_to_dashboard(self, report):
         """Send health report to central dashboard"""
         try:
-            response = requests.post(
+            if orjson is not None:
+                body = orjson.dumps(report)
+            else:
+                body = json.dumps(report, separators=(',', ':')).encode()
+
+            # Compress anything beyond a trivial payload; JSON shrinks 5-10x
+            headers = {}
+            if len(body) > 1024:
+                body = gzip.compress(body, compresslevel=1)
+                headers['Content-Encoding'] = 'gzip'
+
+            response = self.session.post(
                 f"{self.config.DASHBOARD_URL}/api/health-report",
-                json=report,
-                headers={'Content-Type': 'application/json'},
+                data=body,
+                headers=headers,
                 timeout=30
             )
             
@@ -110,80 +189,88 @@ class OSHealthAgent:
                 self.show_notification(message)
     
     def show_notification(self, message):
-        """Show notification to user"""
-        print(f"\n🔔 NOTIFICATION: {message['title']}")
-        print(f"📝 {message['content']}")
-        
-        # For Windows/macOS, could use native notifications
-        if platform.system() == "Windows":
-            try:
-                import win10toast
-                toaster = win10toast.ToastNotifier()
-                toaster.show_toast(message['title'], message['content'], duration=10)
-            except ImportError:
-                pass
-        elif platform.system() == "Darwin":  # macOS
-            try:
-                os.system(f"osascript -e 'display notification \"{message['content']}\" with title \"{message['title']}\"'")
-            except:
-                pass
+        """Queue notification for the display worker"""
+        self._notify_q.put(message)
+
+    def _notify_loop(self):
+        """Display queued notifications without blocking the report loop"""
+        toaster = None
+        os_name = platform.system()
+
+        while True:
+            message = self._notify_q.get()
+
+            print(f"\n🔔 NOTIFICATION: {message['title']}")
+            print(f"📝 {message['content']}")
+
+            # For Windows/macOS, could use native notifications
+            if os_name == "Windows":
+                try:
+                    if toaster is None:
+                        import win10toast
+                        toaster = win10toast.ToastNotifier()
+                    toaster.show_toast(message['title'], message['content'], duration=10)
+                except ImportError:
+                    pass
+            elif os_name == "Darwin":  # macOS
+                try:
+                    # JSON quoting doubles as AppleScript string quoting here,
+                    # so user-supplied text can't break out of the script
+                    script = (
+                        f"display notification {json.dumps(message['content'])} "
+                        f"with title {json.dumps(message['title'])}"
+                    )
+                    subprocess.run(["osascript", "-e", script], check=False, timeout=5)
+                except:
+                    pass
     
     def save_local_report(self, report):
-        """Save report locally for offline access"""
+        """Append report to the local rolling log for offline access"""
         try:
-            reports_dir = os.path.join(os.path.expanduser("~"), ".os-health-agent", "reports")
-            os.makedirs(reports_dir, exist_ok=True)
-            
-            filename = f"health_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-            filepath = os.path.join(reports_dir, filename)
-            
-            with open(filepath, 'w') as f:
-                json.dump(report, f, indent=2)
-            
-            # Keep only last 10 reports
-            self.cleanup_old_reports(reports_dir)
-            
+            self._local_log.write(json.dumps(report, separators=(',', ':')) + '\n')
+
+            if self._local_log.tell() > self.MAX_LOCAL_LOG_BYTES:
+                self.rotate_local_log()
+
         except Exception as e:
             print(f"⚠️ Could not save local report: {e}")
-    
-    def cleanup_old_reports(self, reports_dir):
-        """Keep only the last 10 reports"""
-        try:
-            files = [f for f in os.listdir(reports_dir) if f.startswith('health_report_')]
-            files.sort(reverse=True)
-            
-            for file in files[10:]:  # Keep only last 10
-                os.remove(os.path.join(reports_dir, file))
-        except:
-            pass
+
+    def rotate_local_log(self):
+        """Roll the current log aside and start a fresh one"""
+        log_path = self.config.REPORTS_DIR / "reports.ndjson"
+        self._local_log.close()
+        os.replace(log_path, log_path.with_name("reports.ndjson.1"))
+        self._local_log = self.open_local_log()
     
     def check_for_updates_loop(self):
         """Background thread to check for updates"""
-        while self.running:
+        while not self._stop_event.is_set():
             try:
                 if self.updater.check_for_updates():
                     print("🔄 Update available! The agent will restart with the new version.")
                     if self.updater.perform_update():
                         print("✅ Update completed! Restarting agent...")
                         self.restart_agent()
-                
-                time.sleep(self.config.UPDATE_CHECK_INTERVAL)
-                
+
+                self._stop_event.wait(self.config.UPDATE_CHECK_INTERVAL)
+
             except Exception as e:
                 print(f"❌ Error checking for updates: {e}")
-                time.sleep(300)  # Wait 5 minutes before retry
+                self._stop_event.wait(300)  # Wait 5 minutes before retry
     
     def restart_agent(self):
         """Restart the agent after update"""
         try:
-            self.running = False
+            self._stop_event.set()
             os.execv(sys.executable, [sys.executable] + sys.argv)
         except Exception as e:
             print(f"❌ Error restarting agent: {e}")
     
     def stop_agent(self):
         """Stop the agent gracefully"""
-        self.running = False
+        self._stop_event.set()
+        self.session.close()
+        self._local_log.close()
         print("🛑 Agent stopped")
 
 def main():
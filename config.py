@@ -6,6 +6,31 @@ Configuration settings for OS Health Agent
 import os
 from pathlib import Path
 
+# Last version.txt read, keyed by mtime; Config is instantiated by the
+# agent, reporter and updater alike, so skip re-reading an unchanged file
+_VERSION_CACHE = (None, None)
+
+def _read_version(version_file):
+    """Return the version.txt contents, cached until the file changes"""
+    global _VERSION_CACHE
+    try:
+        mtime_ns = os.stat(version_file).st_mtime_ns
+    except OSError:
+        return None
+
+    cached_mtime, cached_version = _VERSION_CACHE
+    if cached_mtime == mtime_ns:
+        return cached_version
+
+    try:
+        with open(version_file) as f:
+            version = f.read().strip()
+    except OSError:
+        return None
+
+    _VERSION_CACHE = (mtime_ns, version)
+    return version
+
 class Config:
     # Agent version
     VERSION = "1.0.0"
@@ -78,13 +103,9 @@ class Config:
         self.REPORTS_DIR.mkdir(exist_ok=True)
         
         # Load version from file if it exists
-        version_file = self.AGENT_DIR / "version.txt"
-        if version_file.exists():
-            try:
-                with open(version_file, 'r') as f:
-                    self.VERSION = f.read().strip()
-            except:
-                pass
+        version = _read_version(self.AGENT_DIR / "version.txt")
+        if version:
+            self.VERSION = version
         
         # Override with environment variables if set
         self.load_from_environment()
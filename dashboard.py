@@ -7,27 +7,84 @@ Web-based dashboard for monitoring all agents
 from flask import Flask, render_template, request, jsonify, redirect, url_for
 from flask_socketio import SocketIO, emit
 from datetime import datetime, timedelta
+import gzip
 import json
+import queue
 import sqlite3
 import os
 import threading
 import time
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'your-secret-key-here'
+
+if orjson is not None:
+    from flask.json.provider import DefaultJSONProvider
+
+    class ORJSONProvider(DefaultJSONProvider):
+        """Serve request/response JSON through orjson's C encoder"""
+
+        def dumps(self, obj, **kwargs):
+            return orjson.dumps(obj).decode()
+
+        def loads(self, s, **kwargs):
+            return orjson.loads(s)
+
+    app.json = ORJSONProvider(app)
+
 socketio = SocketIO(app, cors_allowed_origins="*")
 
+
+def json_loads(s):
+    """Parse JSON with orjson when available"""
+    return orjson.loads(s) if orjson is not None else json.loads(s)
+
 # Database setup
 DB_PATH = 'health_agents.db'
 
 class HealthDashboard:
     def __init__(self):
+        self._db_lock = threading.Lock()
+        self._tls = threading.local()
+        self._conn = self.open_connection()
         self.init_database()
+        self._write_q = queue.Queue(maxsize=1000)
+        self._emit_q = queue.Queue()
+        self._agents_cache = None
+        self._agents_cache_ts = 0.0
+        self._agents_dirty = True
+        self.start_writer_thread()
+        socketio.start_background_task(self._emit_loop)
         self.start_cleanup_thread()
-    
+
+    def open_connection(self):
+        """Open a persistent write connection with WAL mode enabled"""
+        conn = sqlite3.connect(DB_PATH, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.execute("PRAGMA mmap_size=268435456")
+        return conn
+
+    def _read_conn(self):
+        """Get a per-thread connection for read paths (WAL allows concurrent readers)"""
+        conn = getattr(self._tls, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(DB_PATH)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=5000")
+            self._tls.conn = conn
+        return conn
+
     def init_database(self):
         """Initialize SQLite database"""
-        conn = sqlite3.connect(DB_PATH)
+        conn = self._conn
         cursor = conn.cursor()
         
         # Create tables
@@ -82,16 +139,47 @@ class HealthDashboard:
                 sent BOOLEAN DEFAULT FALSE
             )
         ''')
-        
+
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS health_metrics (
+                agent_id TEXT,
+                ts INTEGER,
+                cpu REAL,
+                mem REAL,
+                disk REAL,
+                temp REAL,
+                score INTEGER,
+                alerts INTEGER,
+                PRIMARY KEY (agent_id, ts)
+            )
+        ''')
+
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_hr_agent_ts
+            ON health_reports(agent_id, timestamp DESC)
+        ''')
+
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_alerts_agent_ts
+            ON alerts(agent_id, timestamp DESC)
+        ''')
+
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_msgs_pending
+            ON messages(agent_id, sent, created_at) WHERE sent = 0
+        ''')
+
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_agents_last_seen
+            ON agents(last_seen)
+        ''')
+
         conn.commit()
-        conn.close()
-    
+
     def start_cleanup_thread(self):
-        """Start background thread for cleanup tasks"""
-        cleanup_thread = threading.Thread(target=self.cleanup_old_data)
-        cleanup_thread.daemon = True
-        cleanup_thread.start()
-    
+        """Schedule the cleanup task on socket.io's background runner"""
+        socketio.start_background_task(self.cleanup_old_data)
+
     def cleanup_old_data(self):
         """Clean up old data periodically"""
         while True:
@@ -122,20 +210,18 @@ class HealthDashboard:
                 
                 conn.commit()
                 conn.close()
-                
-                time.sleep(3600)  # Run every hour
-                
+
+                self._agents_dirty = True
+
             except Exception as e:
                 print(f"Error in cleanup: {e}")
-                time.sleep(3600)
+
+            socketio.sleep(3600)  # Run every hour
     
-    def register_agent(self, agent_data):
+    def register_agent(self, agent_data, cursor):
         """Register or update agent information"""
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        
         cursor.execute('''
-            INSERT OR REPLACE INTO agents 
+            INSERT OR REPLACE INTO agents
             (agent_id, hostname, os_info, local_ip, public_ip, last_seen, agent_version, status)
             VALUES (?, ?, ?, ?, ?, ?, ?, 'online')
         ''', (
@@ -147,16 +233,103 @@ class HealthDashboard:
             datetime.now(),
             agent_data.get('agent_version', '1.0.0')
         ))
-        
-        conn.commit()
-        conn.close()
-    
-    def save_health_report(self, report_data):
-        """Save health report to database"""
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        
-        # Register/update agent
+
+    def start_writer_thread(self):
+        """Start background thread that drains the report write queue"""
+        writer_thread = threading.Thread(target=self._writer_loop)
+        writer_thread.daemon = True
+        writer_thread.start()
+
+    def _writer_loop(self):
+        """Drain queued reports and write each batch in one transaction"""
+        while True:
+            batch = [self._write_q.get()]
+            try:
+                while len(batch) < 64:
+                    batch.append(self._write_q.get_nowait())
+            except queue.Empty:
+                pass
+
+            try:
+                self._write_reports(batch)
+            except Exception as e:
+                print(f"Error writing report batch: {e}")
+                # Retry one report per transaction so a single bad
+                # report only drops itself, not the whole batch
+                for item in batch:
+                    try:
+                        self._write_reports([item])
+                    except Exception as e:
+                        print(f"Error writing report: {e}")
+
+    def save_health_report(self, report_data, raw_json=None):
+        """Queue health report for the background writer"""
+        # Reject malformed payloads here so the endpoint errors the
+        # offending request instead of poisoning a writer batch
+        if not isinstance(report_data, dict) or 'agent_id' not in report_data:
+            raise ValueError("Invalid health report payload")
+
+        try:
+            self._write_q.put_nowait((report_data, raw_json))
+        except queue.Full:
+            # Drop the oldest queued report so fresh data keeps flowing
+            try:
+                self._write_q.get_nowait()
+            except queue.Empty:
+                pass
+            self._write_q.put_nowait((report_data, raw_json))
+
+        # Queue the real-time update for the emitter task
+        self._emit_q.put({
+            'agent_id': report_data['agent_id'],
+            'health_score': report_data.get('health_score', 0),
+            'alerts': report_data.get('alerts', []),
+            'timestamp': datetime.now().isoformat()
+        })
+
+    def _emit_loop(self):
+        """Coalesce queued updates per agent and broadcast outside the request path"""
+        while True:
+            # Wait cooperatively: a blocking Queue.get would wedge the
+            # eventlet/gevent hub thread this task runs on
+            try:
+                update = self._emit_q.get_nowait()
+            except queue.Empty:
+                socketio.sleep(0.1)
+                continue
+
+            pending = {update['agent_id']: update}
+
+            # Merge anything else arriving within the coalescing window
+            deadline = time.monotonic() + 0.1
+            while time.monotonic() < deadline:
+                try:
+                    update = self._emit_q.get_nowait()
+                except queue.Empty:
+                    socketio.sleep(0.02)
+                    continue
+                pending[update['agent_id']] = update
+
+            for update in pending.values():
+                socketio.emit('agent_update', update)
+
+    def _write_reports(self, reports):
+        """Write a batch of reports to the database in one transaction"""
+        with self._db_lock:
+            cursor = self._conn.cursor()
+            cursor.execute('BEGIN')
+            try:
+                for report_data, raw_json in reports:
+                    self._insert_report(cursor, report_data, raw_json)
+                cursor.execute('COMMIT')
+            except Exception:
+                cursor.execute('ROLLBACK')
+                raise
+
+        self._agents_dirty = True
+
+    def _insert_report(self, cursor, report_data, raw_json=None):
+        """Insert a single report's rows using the caller's cursor"""
         system_info = report_data.get('system', {})
         agent_info = {
             'agent_id': report_data['agent_id'],
@@ -166,59 +339,85 @@ class HealthDashboard:
             'public_ip': system_info.get('public_ip', 'unknown'),
             'agent_version': report_data.get('agent_version', '1.0.0')
         }
-        self.register_agent(agent_info)
-        
-        # Save health report
+
+        alert_rows = [
+            (
+                report_data['agent_id'],
+                alert.get('level', 'info'),
+                alert.get('component', 'system'),
+                alert.get('message', 'Unknown alert')
+            )
+            for alert in report_data.get('alerts', [])
+        ]
+
+        self.register_agent(agent_info, cursor)
+
         cursor.execute('''
             INSERT INTO health_reports (agent_id, report_data, health_score, alert_count)
             VALUES (?, ?, ?, ?)
         ''', (
             report_data['agent_id'],
-            json.dumps(report_data),
+            raw_json if raw_json is not None else json.dumps(report_data, separators=(',', ':')),
             report_data.get('health_score', 0),
             len(report_data.get('alerts', []))
         ))
-        
-        # Save alerts
-        for alert in report_data.get('alerts', []):
-            cursor.execute('''
+
+        if alert_rows:
+            cursor.executemany('''
                 INSERT INTO alerts (agent_id, level, component, message)
                 VALUES (?, ?, ?, ?)
-            ''', (
-                report_data['agent_id'],
-                alert.get('level', 'info'),
-                alert.get('component', 'system'),
-                alert.get('message', 'Unknown alert')
-            ))
-        
-        conn.commit()
-        conn.close()
-        
-        # Emit real-time update to dashboard
-        socketio.emit('agent_update', {
-            'agent_id': report_data['agent_id'],
-            'health_score': report_data.get('health_score', 0),
-            'alerts': report_data.get('alerts', []),
-            'timestamp': datetime.now().isoformat()
-        })
-    
+            ''', alert_rows)
+
+        # Normalized timeseries row so charts never re-parse report JSON
+        cpu_info = report_data.get('cpu') or {}
+        mem_info = report_data.get('memory') or {}
+        disks = report_data.get('disk') or []
+        disk_usage = None
+        if isinstance(disks, list):
+            disk_usage = max(
+                (d.get('usage_percent', 0) for d in disks if isinstance(d, dict)),
+                default=None
+            )
+
+        cursor.execute('''
+            INSERT OR REPLACE INTO health_metrics
+            (agent_id, ts, cpu, mem, disk, temp, score, alerts)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (
+            report_data['agent_id'],
+            int(time.time()),
+            cpu_info.get('usage_percent'),
+            mem_info.get('usage_percent'),
+            disk_usage,
+            cpu_info.get('temperature'),
+            report_data.get('health_score', 0),
+            len(report_data.get('alerts', []))
+        ))
+
     def get_all_agents(self):
         """Get all agents with their latest data"""
-        conn = sqlite3.connect(DB_PATH)
+        # Serve the cached list while it is fresh and nothing has changed
+        if (self._agents_cache is not None and not self._agents_dirty
+                and time.monotonic() - self._agents_cache_ts < 2.0):
+            return self._agents_cache
+
+        conn = self._read_conn()
         cursor = conn.cursor()
         
         cursor.execute('''
-            SELECT a.*, 
-                   hr.health_score, 
+            WITH latest AS (
+                SELECT agent_id, MAX(timestamp) AS ts
+                FROM health_reports
+                GROUP BY agent_id
+            )
+            SELECT a.*,
+                   hr.health_score,
                    hr.alert_count,
                    hr.timestamp as last_report
             FROM agents a
-            LEFT JOIN health_reports hr ON a.agent_id = hr.agent_id
-            WHERE hr.timestamp = (
-                SELECT MAX(timestamp) 
-                FROM health_reports 
-                WHERE agent_id = a.agent_id
-            ) OR hr.timestamp IS NULL
+            LEFT JOIN latest l ON l.agent_id = a.agent_id
+            LEFT JOIN health_reports hr
+                   ON hr.agent_id = l.agent_id AND hr.timestamp = l.ts
             ORDER BY a.last_seen DESC
         ''')
         
@@ -238,13 +437,15 @@ class HealthDashboard:
                 'alert_count': row[11] or 0,
                 'last_report': row[12]
             })
-        
-        conn.close()
+
+        self._agents_cache = agents
+        self._agents_cache_ts = time.monotonic()
+        self._agents_dirty = False
         return agents
     
     def get_agent_details(self, agent_id):
         """Get detailed information for a specific agent"""
-        conn = sqlite3.connect(DB_PATH)
+        conn = self._read_conn()
         cursor = conn.cursor()
         
         # Get agent info
@@ -263,7 +464,7 @@ class HealthDashboard:
         ''', (agent_id,))
         
         report_row = cursor.fetchone()
-        latest_report = json.loads(report_row[0]) if report_row else {}
+        latest_report = json_loads(report_row[0]) if report_row else {}
         
         # Get recent alerts
         cursor.execute('''
@@ -282,9 +483,7 @@ class HealthDashboard:
                 'message': alert_row[2],
                 'timestamp': alert_row[3]
             })
-        
-        conn.close()
-        
+
         return {
             'agent_id': agent_row[1],
             'hostname': agent_row[2],
@@ -314,38 +513,27 @@ class HealthDashboard:
     
     def get_pending_messages(self, agent_id):
         """Get pending messages for an agent"""
-        conn = sqlite3.connect(DB_PATH)
+        conn = self._read_conn()
         cursor = conn.cursor()
-        
+
+        # Fetch and mark sent in one atomic statement (SQLite >= 3.35)
         cursor.execute('''
-            SELECT id, title, content, message_type 
-            FROM messages 
+            UPDATE messages
+            SET sent = TRUE
             WHERE agent_id = ? AND sent = FALSE
-            ORDER BY created_at ASC
+            RETURNING title, content, message_type, created_at
         ''', (agent_id,))
-        
-        messages = []
-        message_ids = []
-        
-        for row in cursor.fetchall():
-            messages.append({
-                'title': row[1],
-                'content': row[2],
-                'type': row[3]
-            })
-            message_ids.append(row[0])
-        
-        # Mark messages as sent
-        if message_ids:
-            cursor.execute(f'''
-                UPDATE messages 
-                SET sent = TRUE 
-                WHERE id IN ({','.join(['?' for _ in message_ids])})
-            ''', message_ids)
-            conn.commit()
-        
-        conn.close()
-        return messages
+
+        rows = cursor.fetchall()
+        conn.commit()
+
+        # RETURNING order is unspecified; keep delivery oldest-first
+        rows.sort(key=lambda row: row[3])
+
+        return [
+            {'title': row[0], 'content': row[1], 'type': row[2]}
+            for row in rows
+        ]
 
 # Initialize dashboard
 dashboard = HealthDashboard()
@@ -369,8 +557,12 @@ def agent_details(agent_id):
 def receive_health_report():
     """Receive health report from agent"""
     try:
-        report_data = request.json
-        dashboard.save_health_report(report_data)
+        raw_bytes = request.get_data()
+        if request.headers.get('Content-Encoding') == 'gzip':
+            raw_bytes = gzip.decompress(raw_bytes)
+        raw = raw_bytes.decode('utf-8')
+        report_data = json_loads(raw)
+        dashboard.save_health_report(report_data, raw)
         
         # Get pending messages for this agent
         messages = dashboard.get_pending_messages(report_data['agent_id'])
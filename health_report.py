@@ -5,67 +5,245 @@ Health Reporter - Collects system health information
 
 import os
 import json
+import time
 import psutil
 import platform
 import subprocess
 import socket
+import threading
+import urllib.request
+import concurrent.futures
 from datetime import datetime
 
+# Shared pool for report collectors; they are I/O- and syscall-bound,
+# so threads overlap their waits without process overhead
+_EXECUTOR = concurrent.futures.ThreadPoolExecutor(max_workers=8)
+
 class HealthReporter:
+    # Bytes per gigabyte for unit conversion
+    _GB = 1 << 30
+
+    # Alert tables: (threshold, level, message prefix), tried in order
+    _CPU_ALERTS = ((90, "critical", "High CPU usage"),
+                   (80, "warning", "Elevated CPU usage"))
+    _MEM_ALERTS = ((95, "critical", "Critical memory usage"),
+                   (85, "warning", "High memory usage"))
+
+    # Score tables: (threshold, penalty), tried in order
+    _CPU_PENALTIES = ((80, 20), (60, 10))
+    _MEM_PENALTIES = ((90, 25), (75, 15))
+
+    # Pseudo/overlay filesystems that aren't worth a statvfs each
+    _PSEUDO_FSTYPES = {"tmpfs", "devtmpfs", "squashfs", "overlay", "proc", "sysfs"}
+
+    # How often the background sampler refreshes each collector (seconds)
+    _SAMPLE_INTERVALS = {
+        "system": 30,
+        "cpu": 2,
+        "memory": 1,
+        "disk": 30,
+        "network": 15,
+        "security": 3600,
+        "services": 60,
+    }
+
     def __init__(self):
         self.os_name = platform.system()
         self.hostname = socket.gethostname()
-        
-    def generate_report(self):
-        """Generate complete health report"""
-        report = {
-            "system": self.get_system_info(),
-            "cpu": self.get_cpu_info(),
-            "memory": self.get_memory_info(),
-            "disk": self.get_disk_info(),
-            "network": self.get_network_info(),
-            "security": self.get_security_status(),
-            "services": self.get_critical_services(),
-            "health_score": 0,
-            "alerts": []
+
+        # Hot paths branch on the OS constantly; compare booleans, not
+        # strings returned by platform.system()
+        self._is_linux = self.os_name == "Linux"
+        self._is_windows = self.os_name == "Windows"
+        self._is_macos = self.os_name == "Darwin"
+
+        # Static OS/hardware facts never change in-process; query them once
+        # (platform.* can parse /proc or shell out on some OSes)
+        self._os_release = platform.release()
+        self._os_version = platform.version()
+        self._arch = platform.machine()
+        self._os_label = f"{self.os_name} {self._os_release}"
+        self._phys_cores = psutil.cpu_count(logical=False)
+        self._log_cores = psutil.cpu_count(logical=True)
+        self._boot_time = psutil.boot_time()
+        self._boot_iso = datetime.fromtimestamp(self._boot_time).isoformat()
+
+        # net_connections walks every socket in /proc; cache the count
+        self._net_conn_cache = (0, 0.0)
+        self._net_conn_ttl = 15
+
+        # The partition table changes rarely; cache the filtered list
+        self._partitions_cache = (None, 0.0)
+        self._partitions_ttl = 60
+
+        # Update counts change slowly; cache the whole security status
+        self._security_cache = (None, 0.0)
+        self._security_ttl = 3600
+
+        # Remember where the CPU temperature reading came from so later
+        # polls go straight to that source instead of re-probing
+        self._temp_source = None
+
+        # Public IP rarely changes; don't block every report on ipify
+        self._public_ip_cache = ("unknown", 0.0)
+        self._public_ip_ttl = 3600
+
+        # Local IP only changes on network events; resolve it once
+        self._local_ip = self.detect_local_ip()
+
+        # Prior /proc/stat snapshot for non-blocking CPU deltas on Linux
+        self._prev_stat = self._read_proc_stat() if self._is_linux else None
+
+        # Installed tooling and the critical-services list don't change
+        # at runtime; probe them once instead of per report
+        self._pkgmgr = self.detect_package_manager() if self._is_linux else None
+        self._critical_services = self.list_critical_services()
+
+        self._collectors = {
+            "system": self.get_system_info,
+            "cpu": self.get_cpu_info,
+            "memory": self.get_memory_info,
+            "disk": self.get_disk_info,
+            "network": self.get_network_info,
+            "security": self.get_security_status,
+            "services": self.get_critical_services,
         }
-        
+
+        # Background sampler keeps snapshots fresh at per-collector
+        # cadences so generate_report never blocks on collection
+        self._snapshot_lock = threading.Lock()
+        self._snapshots = {}
+        sampler_thread = threading.Thread(target=self._sampler_loop)
+        sampler_thread.daemon = True
+        sampler_thread.start()
+
+    # Sections a lite report leaves out; they are the expensive ones
+    # (package managers, service probes) and change the slowest
+    _LITE_SKIP = frozenset({"security", "services"})
+
+    def generate_report(self, level="full"):
+        """Assemble a health report from the sampler's cached snapshots"""
+        with self._snapshot_lock:
+            report = dict(self._snapshots)
+
+        if level == "lite":
+            for name in self._LITE_SKIP:
+                report.pop(name, None)
+
+        # Collect anything the sampler hasn't produced yet (first report)
+        missing = [name for name in self._collectors
+                   if name not in report
+                   and not (level == "lite" and name in self._LITE_SKIP)]
+        if missing:
+            futures = {
+                name: _EXECUTOR.submit(self._collectors[name])
+                for name in missing
+            }
+            for name, future in futures.items():
+                report[name] = future.result()
+
         # Calculate health score and generate alerts
-        report["health_score"] = self.calculate_health_score(report)
-        report["alerts"] = self.generate_alerts(report)
-        
+        report["health_score"], report["alerts"] = self.score_and_alerts(report)
+
         return report
+
+    def _sampler_loop(self):
+        """Refresh each collector's snapshot at its own cadence"""
+        last_run = {name: 0.0 for name in self._collectors}
+
+        while True:
+            now = time.monotonic()
+            due = [name for name, interval in self._SAMPLE_INTERVALS.items()
+                   if now - last_run[name] >= interval]
+
+            if due:
+                # Due collectors run concurrently; each result replaces
+                # its snapshot as soon as it lands
+                futures = {
+                    name: _EXECUTOR.submit(self._collectors[name])
+                    for name in due
+                }
+                for name, future in futures.items():
+                    try:
+                        value = future.result()
+                    except Exception as e:
+                        value = {"error": str(e)}
+                    with self._snapshot_lock:
+                        self._snapshots[name] = value
+                    last_run[name] = time.monotonic()
+
+            time.sleep(0.5)
     
     def get_system_info(self):
         """Get basic system information"""
         try:
-            boot_time = datetime.fromtimestamp(psutil.boot_time())
-            uptime = datetime.now() - boot_time
-            
+            # Boot time is fixed; only the uptime arithmetic runs per report
+            uptime = int(time.time() - self._boot_time)
+            minutes, seconds = divmod(uptime, 60)
+            hours, minutes = divmod(minutes, 60)
+
             return {
                 "hostname": self.hostname,
-                "os": f"{platform.system()} {platform.release()}",
-                "version": platform.version(),
-                "architecture": platform.machine(),
-                "boot_time": boot_time.isoformat(),
-                "uptime_seconds": int(uptime.total_seconds()),
-                "uptime_human": str(uptime).split('.')[0],
+                "os": self._os_label,
+                "version": self._os_version,
+                "architecture": self._arch,
+                "boot_time": self._boot_iso,
+                "uptime_seconds": uptime,
+                "uptime_human": f"{hours}:{minutes:02d}:{seconds:02d}",
                 "local_ip": self.get_local_ip(),
                 "public_ip": self.get_public_ip()
             }
         except Exception as e:
             return {"error": str(e)}
     
+    def _read_proc_stat(self):
+        """Parse per-core (total, idle) jiffy counters from /proc/stat"""
+        cores = []
+        try:
+            with open("/proc/stat") as f:
+                for line in f:
+                    # Per-core lines are "cpu0", "cpu1", ...; skip the aggregate
+                    if line.startswith("cpu") and line[3].isdigit():
+                        fields = [int(x) for x in line.split()[1:]]
+                        idle = fields[3] + (fields[4] if len(fields) > 4 else 0)
+                        cores.append((sum(fields), idle))
+        except (OSError, ValueError, IndexError):
+            return None
+        return cores or None
+
+    def cpu_percent_per_core(self):
+        """Per-core CPU usage; diffs /proc/stat on Linux, psutil elsewhere"""
+        if self._prev_stat:
+            current = self._read_proc_stat()
+            if current and len(current) == len(self._prev_stat):
+                per_core = []
+                for (total, idle), (prev_total, prev_idle) in zip(current, self._prev_stat):
+                    total_delta = total - prev_total
+                    idle_delta = idle - prev_idle
+                    if total_delta <= 0:
+                        per_core.append(0.0)
+                    else:
+                        per_core.append(round(100.0 * (1 - idle_delta / total_delta), 1))
+                self._prev_stat = current
+                return per_core
+
+        return psutil.cpu_percent(interval=1, percpu=True)
+
     def get_cpu_info(self):
         """Get CPU information and usage"""
         try:
+            # One sample; the aggregate is derived from the per-core
+            # values instead of blocking a second time
+            per_core = self.cpu_percent_per_core()
+            freq = psutil.cpu_freq()
+
             return {
-                "physical_cores": psutil.cpu_count(logical=False),
-                "logical_cores": psutil.cpu_count(logical=True),
-                "current_frequency": psutil.cpu_freq().current if psutil.cpu_freq() else None,
-                "max_frequency": psutil.cpu_freq().max if psutil.cpu_freq() else None,
-                "usage_percent": psutil.cpu_percent(interval=1),
-                "usage_per_core": psutil.cpu_percent(interval=1, percpu=True),
+                "physical_cores": self._phys_cores,
+                "logical_cores": self._log_cores,
+                "current_frequency": freq.current if freq else None,
+                "max_frequency": freq.max if freq else None,
+                "usage_percent": round(sum(per_core) / len(per_core), 1) if per_core else 0,
+                "usage_per_core": per_core,
                 "load_average": os.getloadavg() if hasattr(os, 'getloadavg') else None,
                 "temperature": self.get_cpu_temperature()
             }
@@ -79,32 +257,54 @@ class HealthReporter:
             swap_mem = psutil.swap_memory()
             
             return {
-                "total_gb": round(virtual_mem.total / (1024**3), 2),
-                "available_gb": round(virtual_mem.available / (1024**3), 2),
-                "used_gb": round(virtual_mem.used / (1024**3), 2),
+                "total_gb": round(virtual_mem.total / self._GB, 2),
+                "available_gb": round(virtual_mem.available / self._GB, 2),
+                "used_gb": round(virtual_mem.used / self._GB, 2),
                 "usage_percent": virtual_mem.percent,
-                "swap_total_gb": round(swap_mem.total / (1024**3), 2),
-                "swap_used_gb": round(swap_mem.used / (1024**3), 2),
+                "swap_total_gb": round(swap_mem.total / self._GB, 2),
+                "swap_used_gb": round(swap_mem.used / self._GB, 2),
                 "swap_percent": swap_mem.percent
             }
         except Exception as e:
             return {"error": str(e)}
     
+    def list_partitions(self):
+        """Return real, deduplicated partitions, cached for a minute"""
+        partitions, ts = self._partitions_cache
+        now = time.monotonic()
+
+        if partitions is not None and now - ts < self._partitions_ttl:
+            return partitions
+
+        partitions = []
+        seen_devices = set()
+        for partition in psutil.disk_partitions():
+            if partition.fstype in self._PSEUDO_FSTYPES:
+                continue
+            # Bind mounts show the same device twice; stat it once
+            if partition.device in seen_devices:
+                continue
+            seen_devices.add(partition.device)
+            partitions.append(partition)
+
+        self._partitions_cache = (partitions, now)
+        return partitions
+
     def get_disk_info(self):
         """Get disk information"""
         try:
             disk_info = []
-            
-            for partition in psutil.disk_partitions():
+
+            for partition in self.list_partitions():
                 try:
                     usage = psutil.disk_usage(partition.mountpoint)
                     disk_info.append({
                         "device": partition.device,
                         "mountpoint": partition.mountpoint,
                         "filesystem": partition.fstype,
-                        "total_gb": round(usage.total / (1024**3), 2),
-                        "used_gb": round(usage.used / (1024**3), 2),
-                        "free_gb": round(usage.free / (1024**3), 2),
+                        "total_gb": round(usage.total / self._GB, 2),
+                        "used_gb": round(usage.used / self._GB, 2),
+                        "free_gb": round(usage.free / self._GB, 2),
                         "usage_percent": round((usage.used / usage.total) * 100, 2)
                     })
                 except PermissionError:
@@ -118,8 +318,8 @@ class HealthReporter:
         """Get network information"""
         try:
             network_stats = psutil.net_io_counters()
-            connections = len(psutil.net_connections())
-            
+            connections = self.get_connection_count()
+
             return {
                 "bytes_sent": network_stats.bytes_sent,
                 "bytes_received": network_stats.bytes_recv,
@@ -131,6 +331,18 @@ class HealthReporter:
         except Exception as e:
             return {"error": str(e)}
     
+    def get_connection_count(self):
+        """Count active inet sockets, cached for a short TTL"""
+        count, ts = self._net_conn_cache
+        now = time.monotonic()
+
+        if ts and now - ts < self._net_conn_ttl:
+            return count
+
+        count = len(psutil.net_connections(kind="inet"))
+        self._net_conn_cache = (count, now)
+        return count
+
     def get_network_interfaces(self):
         """Get network interface information"""
         try:
@@ -150,19 +362,51 @@ class HealthReporter:
     def get_security_status(self):
         """Get security and update status"""
         try:
-            if self.os_name == "Linux":
+            if self._is_linux:
                 return self.get_linux_security_status()
-            elif self.os_name == "Windows":
+            elif self._is_windows:
                 return self.get_windows_security_status()
-            elif self.os_name == "Darwin":  # macOS
+            elif self._is_macos:
                 return self.get_macos_security_status()
             else:
                 return {"status": "unknown", "details": "OS not supported"}
         except Exception as e:
             return {"error": str(e)}
     
+    def detect_package_manager(self):
+        """Detect which Linux package manager is installed"""
+        if os.path.exists("/usr/bin/apt"):
+            return "apt"
+        if os.path.exists("/usr/bin/dnf"):
+            return "dnf"
+        if os.path.exists("/usr/bin/yum"):
+            return "yum"
+        return None
+
+    def list_critical_services(self):
+        """Critical services to watch on this OS"""
+        if self._is_linux:
+            return ["ssh", "systemd", "network", "cron"]
+        elif self._is_windows:
+            return ["Themes", "Spooler", "BITS", "Winmgmt"]
+        elif self._is_macos:
+            return ["com.apple.loginwindow", "com.apple.WindowServer"]
+        return []
+
+    def apt_index_stale(self, max_age=6 * 3600):
+        """Check whether the apt package index is older than max_age"""
+        try:
+            stamp = os.stat("/var/lib/apt/periodic/update-success-stamp").st_mtime
+            return time.time() - stamp > max_age
+        except OSError:
+            return True
+
     def get_linux_security_status(self):
         """Get Linux security status"""
+        cached, ts = self._security_cache
+        if cached is not None and time.monotonic() - ts < self._security_ttl:
+            return cached
+
         try:
             status = {
                 "updates_available": 0,
@@ -170,47 +414,78 @@ class HealthReporter:
                 "last_update_check": None,
                 "package_manager": "unknown"
             }
-            
-            # Check for apt (Debian/Ubuntu)
-            if os.path.exists("/usr/bin/apt"):
+
+            # apt (Debian/Ubuntu)
+            if self._pkgmgr == "apt":
                 status["package_manager"] = "apt"
                 try:
-                    # Update package list
-                    subprocess.run(["sudo", "apt", "update"], capture_output=True, check=True)
-                    
-                    # Check for upgradable packages
-                    result = subprocess.run(["apt", "list", "--upgradable"], 
-                                          capture_output=True, text=True)
-                    if result.stdout:
-                        lines = result.stdout.strip().split('\n')[1:]  # Skip header
-                        status["updates_available"] = len(lines)
-                    
-                    # Check for security updates
-                    result = subprocess.run(["apt", "list", "--upgradable"], 
-                                          capture_output=True, text=True)
-                    security_count = result.stdout.count('security')
-                    status["security_updates"] = security_count
-                    
-                except subprocess.CalledProcessError:
+                    # Refresh the package list only when the index is stale
+                    if self.apt_index_stale():
+                        subprocess.run(["sudo", "apt", "update"],
+                                     capture_output=True, check=True, timeout=120)
+
+                    # One streamed listing yields both counts
+                    updates, security = self.count_upgradable(
+                        ["apt", "list", "--upgradable"], timeout=60, skip_header=True)
+                    status["updates_available"] = updates
+                    status["security_updates"] = security
+
+                except (subprocess.CalledProcessError, subprocess.TimeoutExpired):
                     pass
-            
-            # Check for yum/dnf (RedHat/CentOS/Fedora)
-            elif os.path.exists("/usr/bin/yum") or os.path.exists("/usr/bin/dnf"):
+
+            # yum/dnf (RedHat/CentOS/Fedora)
+            elif self._pkgmgr in ("dnf", "yum"):
                 status["package_manager"] = "yum/dnf"
                 try:
-                    cmd = "dnf" if os.path.exists("/usr/bin/dnf") else "yum"
-                    result = subprocess.run([cmd, "check-update"], 
-                                          capture_output=True, text=True)
-                    if result.stdout:
-                        lines = result.stdout.strip().split('\n')
-                        status["updates_available"] = len([l for l in lines if l and not l.startswith('#')])
-                except subprocess.CalledProcessError:
+                    updates, _ = self.count_upgradable(
+                        [self._pkgmgr, "check-update"], timeout=120)
+                    status["updates_available"] = updates
+                except (subprocess.CalledProcessError, subprocess.TimeoutExpired):
                     pass
-            
+
+            self._security_cache = (status, time.monotonic())
             return status
         except Exception as e:
             return {"error": str(e)}
     
+    def count_upgradable(self, cmd, timeout, skip_header=False):
+        """Stream a package listing, counting lines without buffering it all"""
+        updates = 0
+        security = 0
+
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE,
+                                stderr=subprocess.DEVNULL, text=True)
+
+        # The read loop itself needs a deadline: a wedged package manager
+        # never reaches EOF, which would block this sampler thread forever
+        timed_out = threading.Event()
+
+        def kill_proc():
+            timed_out.set()
+            proc.kill()
+
+        watchdog = threading.Timer(timeout, kill_proc)
+        watchdog.start()
+        try:
+            if skip_header:
+                next(proc.stdout, None)
+            for line in proc.stdout:
+                line = line.strip()
+                if not line or line.startswith('#'):
+                    continue
+                updates += 1
+                if 'security' in line:
+                    security += 1
+            proc.wait()
+        finally:
+            watchdog.cancel()
+            proc.stdout.close()
+
+        if timed_out.is_set():
+            raise subprocess.TimeoutExpired(cmd, timeout)
+
+        return updates, security
+
     def get_windows_security_status(self):
         """Get Windows security status"""
         try:
@@ -226,8 +501,9 @@ class HealthReporter:
                 ps_command = """
                 Get-WUList | Measure-Object | Select-Object -ExpandProperty Count
                 """
-                result = subprocess.run(["powershell", "-Command", ps_command], 
-                                      capture_output=True, text=True)
+                result = subprocess.run(
+                    ["powershell", "-NoProfile", "-NonInteractive", "-Command", ps_command],
+                    capture_output=True, text=True, timeout=60)
                 if result.returncode == 0:
                     status["windows_updates"] = int(result.stdout.strip())
             except:
@@ -248,8 +524,8 @@ class HealthReporter:
             
             # Check for software updates
             try:
-                result = subprocess.run(["softwareupdate", "-l"], 
-                                      capture_output=True, text=True)
+                result = subprocess.run(["softwareupdate", "-l"],
+                                      capture_output=True, text=True, timeout=120)
                 if "No new software available" in result.stdout:
                     status["software_updates"] = 0
                 else:
@@ -268,39 +544,50 @@ class HealthReporter:
         """Get status of critical services"""
         try:
             services = []
-            
-            # Common critical services by OS
-            if self.os_name == "Linux":
-                critical_services = ["ssh", "systemd", "network", "cron"]
-            elif self.os_name == "Windows":
-                critical_services = ["Themes", "Spooler", "BITS", "Winmgmt"]
-            elif self.os_name == "Darwin":
-                critical_services = ["com.apple.loginwindow", "com.apple.WindowServer"]
+            critical_services = self._critical_services
+
+            if self._is_linux and critical_services:
+                # One systemctl invocation reports every unit at once
+                statuses = self.check_services_batch(critical_services)
             else:
-                critical_services = []
-            
-            for service in critical_services:
-                status = self.check_service_status(service)
+                statuses = [self.check_service_status(s) for s in critical_services]
+
+            for service, status in zip(critical_services, statuses):
                 services.append({
                     "name": service,
                     "status": status,
                     "critical": True
                 })
-            
+
             return services
         except Exception as e:
             return {"error": str(e)}
-    
+
+    def check_services_batch(self, service_names):
+        """Check several systemd units with a single systemctl call"""
+        try:
+            result = subprocess.run(["systemctl", "is-active", *service_names],
+                                  capture_output=True, text=True, timeout=30)
+            lines = result.stdout.splitlines()
+            if len(lines) == len(service_names):
+                return ["active" if line.strip() == "active" else "inactive"
+                        for line in lines]
+        except:
+            pass
+
+        # Fall back to per-service checks if the batch output looks off
+        return [self.check_service_status(s) for s in service_names]
+
     def check_service_status(self, service_name):
         """Check if a service is running"""
         try:
-            if self.os_name == "Linux":
-                result = subprocess.run(["systemctl", "is-active", service_name], 
-                                      capture_output=True, text=True)
+            if self._is_linux:
+                result = subprocess.run(["systemctl", "is-active", service_name],
+                                      capture_output=True, text=True, timeout=30)
                 return "active" if result.returncode == 0 else "inactive"
-            elif self.os_name == "Windows":
-                result = subprocess.run(["sc", "query", service_name], 
-                                      capture_output=True, text=True)
+            elif self._is_windows:
+                result = subprocess.run(["sc", "query", service_name],
+                                      capture_output=True, text=True, timeout=30)
                 return "running" if "RUNNING" in result.stdout else "stopped"
             else:
                 return "unknown"
@@ -310,18 +597,48 @@ class HealthReporter:
     def get_cpu_temperature(self):
         """Get CPU temperature if available"""
         try:
+            source = self._temp_source
+
+            # Once we know where the reading lives, go straight there
+            if source == "none":
+                return None
+            if source == "sysfs":
+                return self._read_sysfs_temp()
+            if source is not None:
+                temps = psutil.sensors_temperatures()
+                entries = temps.get(source)
+                return entries[0].current if entries else None
+
+            # First call: probe the cheap sysfs path, then psutil sensors
+            if self._is_linux:
+                temp = self._read_sysfs_temp()
+                if temp is not None:
+                    self._temp_source = "sysfs"
+                    return temp
+
             if hasattr(psutil, 'sensors_temperatures'):
                 temps = psutil.sensors_temperatures()
                 if temps:
                     for name, entries in temps.items():
                         if 'cpu' in name.lower() or 'core' in name.lower():
+                            self._temp_source = name
                             return entries[0].current if entries else None
+
+            self._temp_source = "none"
             return None
         except:
             return None
+
+    def _read_sysfs_temp(self):
+        """Read the thermal zone directly; far cheaper than psutil's scan"""
+        try:
+            with open("/sys/class/thermal/thermal_zone0/temp") as f:
+                return int(f.read()) / 1000
+        except (OSError, ValueError):
+            return None
     
-    def get_local_ip(self):
-        """Get local IP address"""
+    def detect_local_ip(self):
+        """Determine the default-route local IP, with an interface-scan fallback"""
         try:
             s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
             s.connect(("8.8.8.8", 80))
@@ -329,129 +646,129 @@ class HealthReporter:
             s.close()
             return ip
         except:
+            # Fall back to the first non-loopback AF_INET interface
+            try:
+                for interface, addrs in psutil.net_if_addrs().items():
+                    if interface == "lo":
+                        continue
+                    for addr in addrs:
+                        if addr.family == socket.AF_INET and not addr.address.startswith("127."):
+                            return addr.address
+            except:
+                pass
             return "unknown"
+
+    def get_local_ip(self):
+        """Get local IP address (resolved once at startup)"""
+        return self._local_ip
     
     def get_public_ip(self):
-        """Get public IP address"""
-        try:
-            import requests
-            response = requests.get("https://api.ipify.org", timeout=5)
-            return response.text.strip()
-        except:
-            return "unknown"
-    
-    def calculate_health_score(self, report):
-        """Calculate overall health score (0-100)"""
+        """Get public IP address (cached for an hour)"""
+        ip, ts = self._public_ip_cache
+        now = time.monotonic()
+
+        if ts and now - ts < self._public_ip_ttl:
+            return ip
+
         try:
-            score = 100
-            
-            # CPU usage penalty
-            if report.get("cpu", {}).get("usage_percent", 0) > 80:
-                score -= 20
-            elif report.get("cpu", {}).get("usage_percent", 0) > 60:
-                score -= 10
-            
-            # Memory usage penalty
-            if report.get("memory", {}).get("usage_percent", 0) > 90:
-                score -= 25
-            elif report.get("memory", {}).get("usage_percent", 0) > 75:
-                score -= 15
-            
-            # Disk usage penalty
-            for disk in report.get("disk", []):
-                if disk.get("usage_percent", 0) > 95:
-                    score -= 20
-                elif disk.get("usage_percent", 0) > 85:
-                    score -= 10
-            
-            # Security updates penalty
-            security_updates = report.get("security", {}).get("security_updates", 0)
-            if security_updates > 0:
-                score -= min(security_updates * 5, 25)
-            
-            # Service status penalty
-            for service in report.get("services", []):
-                if service.get("critical") and service.get("status") not in ["active", "running"]:
-                    score -= 15
-            
-            return max(0, min(100, score))
+            with urllib.request.urlopen("https://api.ipify.org", timeout=2) as response:
+                ip = response.read().decode().strip()
         except:
-            return 50  # Default score if calculation fails
+            ip = "unknown"
+
+        self._public_ip_cache = (ip, now)
+        return ip
     
-    def generate_alerts(self, report):
-        """Generate alerts based on health data"""
+    def score_and_alerts(self, report):
+        """Calculate the health score (0-100) and alerts in a single pass"""
+        score = 100
         alerts = []
-        
+
         try:
-            # CPU alerts
-            cpu_usage = report.get("cpu", {}).get("usage_percent", 0)
-            if cpu_usage > 90:
-                alerts.append({
-                    "level": "critical",
-                    "component": "cpu",
-                    "message": f"High CPU usage: {cpu_usage:.1f}%"
-                })
-            elif cpu_usage > 80:
-                alerts.append({
-                    "level": "warning",
-                    "component": "cpu",
-                    "message": f"Elevated CPU usage: {cpu_usage:.1f}%"
-                })
-            
-            # Memory alerts
-            memory_usage = report.get("memory", {}).get("usage_percent", 0)
-            if memory_usage > 95:
-                alerts.append({
-                    "level": "critical",
-                    "component": "memory",
-                    "message": f"Critical memory usage: {memory_usage:.1f}%"
-                })
-            elif memory_usage > 85:
-                alerts.append({
-                    "level": "warning",
-                    "component": "memory",
-                    "message": f"High memory usage: {memory_usage:.1f}%"
-                })
-            
-            # Disk alerts
-            for disk in report.get("disk", []):
+            cpu = report.get("cpu") or {}
+            mem = report.get("memory") or {}
+            disks = report.get("disk") or []
+            security = report.get("security") or {}
+            services = report.get("services") or []
+
+            # CPU
+            cpu_usage = cpu.get("usage_percent", 0)
+            for threshold, level, prefix in self._CPU_ALERTS:
+                if cpu_usage > threshold:
+                    alerts.append({
+                        "level": level,
+                        "component": "cpu",
+                        "message": f"{prefix}: {cpu_usage:.1f}%"
+                    })
+                    break
+            for threshold, penalty in self._CPU_PENALTIES:
+                if cpu_usage > threshold:
+                    score -= penalty
+                    break
+
+            # Memory
+            memory_usage = mem.get("usage_percent", 0)
+            for threshold, level, prefix in self._MEM_ALERTS:
+                if memory_usage > threshold:
+                    alerts.append({
+                        "level": level,
+                        "component": "memory",
+                        "message": f"{prefix}: {memory_usage:.1f}%"
+                    })
+                    break
+            for threshold, penalty in self._MEM_PENALTIES:
+                if memory_usage > threshold:
+                    score -= penalty
+                    break
+
+            # Disk
+            for disk in disks:
                 usage = disk.get("usage_percent", 0)
                 if usage > 95:
+                    score -= 20
                     alerts.append({
                         "level": "critical",
                         "component": "disk",
                         "message": f"Critical disk usage on {disk.get('mountpoint', 'unknown')}: {usage:.1f}%"
                     })
-                elif usage > 90:
-                    alerts.append({
-                        "level": "warning",
-                        "component": "disk",
-                        "message": f"High disk usage on {disk.get('mountpoint', 'unknown')}: {usage:.1f}%"
-                    })
-            
-            # Security alerts
-            security_updates = report.get("security", {}).get("security_updates", 0)
+                else:
+                    if usage > 85:
+                        score -= 10
+                    if usage > 90:
+                        alerts.append({
+                            "level": "warning",
+                            "component": "disk",
+                            "message": f"High disk usage on {disk.get('mountpoint', 'unknown')}: {usage:.1f}%"
+                        })
+
+            # Security updates
+            security_updates = security.get("security_updates", 0)
             if security_updates > 0:
+                score -= min(security_updates * 5, 25)
                 alerts.append({
                     "level": "warning",
                     "component": "security",
                     "message": f"{security_updates} security updates available"
                 })
-            
-            # Service alerts
-            for service in report.get("services", []):
+
+            # Services
+            for service in services:
                 if service.get("critical") and service.get("status") not in ["active", "running"]:
+                    score -= 15
                     alerts.append({
                         "level": "critical",
                         "component": "service",
                         "message": f"Critical service '{service.get('name')}' is not running"
                     })
-            
+
+            score = max(0, min(100, score))
+
         except Exception as e:
+            score = 50  # Default score if calculation fails
             alerts.append({
                 "level": "error",
                 "component": "system",
                 "message": f"Error generating alerts: {str(e)}"
             })
-        
-        return alerts
\ No newline at end of file
+
+        return score, alerts
\ No newline at end of file
@@ -6,12 +6,15 @@ Works on Windows, Linux, and macOS
 
 import os
 import sys
+import hashlib
 import platform
 import subprocess
 import urllib.request
 import zipfile
 import shutil
 import tempfile
+import threading
+import concurrent.futures
 from pathlib import Path
 import json
 import stat
@@ -22,6 +25,7 @@ class AgentInstaller:
         self.agent_dir = Path.home() / "os-health-agent"
         self.service_name = "os-health-agent"
         self.github_repo = "sumitkpand3y/os-health-agent"  # Replace with actual repo
+        self.service_started = False
         
     def install(self):
         """Main installation process"""
@@ -72,51 +76,66 @@ class AgentInstaller:
         try:
             # Create installation directory
             self.agent_dir.mkdir(parents=True, exist_ok=True)
-            
+
             # Download latest release
             download_url = f"https://github.com/{self.github_repo}/archive/main.zip"
-            
-            with tempfile.NamedTemporaryFile(suffix='.zip', delete=False) as tmp_file:
+
+            files_to_copy = {
+                "agent.py", "health_report.py", "updater.py",
+                "config.py", "requirements.txt", "version.txt"
+            }
+
+            # Stream the archive into a spooled buffer so small downloads
+            # stay in memory and nothing is written to disk twice
+            with tempfile.SpooledTemporaryFile(max_size=32 << 20) as spooled:
                 print(f"⬇️  Downloading from: {download_url}")
-                urllib.request.urlretrieve(download_url, tmp_file.name)
-                
-                # Extract files
-                with zipfile.ZipFile(tmp_file.name, 'r') as zip_ref:
-                    extract_dir = tempfile.mkdtemp()
-                    zip_ref.extractall(extract_dir)
-                    
-                    # Find source directory
-                    source_dir = None
-                    for root, dirs, files in os.walk(extract_dir):
-                        if "agent.py" in files:
-                            source_dir = Path(root)
+                sha256 = hashlib.sha256()
+                with urllib.request.urlopen(download_url) as response:
+                    while True:
+                        block = response.read(1 << 17)
+                        if not block:
                             break
-                    
-                    if not source_dir:
-                        raise Exception("Could not find agent files in download")
-                    
-                    # Copy files to installation directory
-                    files_to_copy = [
-                        "agent.py", "health_report.py", "updater.py", 
-                        "config.py", "requirements.txt", "version.txt"
-                    ]
-                    
-                    for file_name in files_to_copy:
-                        src = source_dir / file_name
-                        dst = self.agent_dir / file_name
-                        
-                        if src.exists():
-                            shutil.copy2(src, dst)
-                            print(f"✅ Copied: {file_name}")
-                        else:
-                            print(f"⚠️  File not found: {file_name}")
-                
-                # Cleanup
-                os.unlink(tmp_file.name)
-                shutil.rmtree(extract_dir)
-                
+                        sha256.update(block)
+                        spooled.write(block)
+
+                with zipfile.ZipFile(spooled) as zip_ref:
+                    # Archive entries look like "<repo>-main/<name>"; keep
+                    # only the agent files and flatten the prefix away
+                    wanted = []
+                    for member in zip_ref.infolist():
+                        name = member.filename.split('/', 1)[-1]
+                        if name in files_to_copy:
+                            member.filename = name
+                            wanted.append(member)
+
+                    # Extractions are independent and I/O-bound; overlap
+                    # them and report after the join so output stays tidy
+                    def extract(member):
+                        zip_ref.extract(member, self.agent_dir)
+                        return member.filename
+
+                    with concurrent.futures.ThreadPoolExecutor(max_workers=4) as pool:
+                        found = set(pool.map(extract, wanted))
+
+                    for name in sorted(found):
+                        print(f"✅ Copied: {name}")
+
+            for file_name in sorted(files_to_copy - found):
+                print(f"⚠️  File not found: {file_name}")
+
+            if "agent.py" not in found:
+                raise Exception("Could not find agent files in download")
+
+            # Stamp what we installed so the updater can skip a release
+            # whose archive digest already matches
+            try:
+                stamp = self.agent_dir / ".install_stamp"
+                stamp.write_text(f"sha256:{sha256.hexdigest()}")
+            except OSError:
+                pass
+
             print("✅ Agent files downloaded successfully")
-            
+
         except Exception as e:
             raise Exception(f"Download failed: {e}")
     
@@ -137,9 +156,10 @@ class AgentInstaller:
             # Install requirements
             requirements_file = self.agent_dir / "requirements.txt"
             if requirements_file.exists():
-                subprocess.run([
-                    sys.executable, "-m", "pip", "install", "-r", str(requirements_file)
-                ], check=True)
+                if not self.install_from_wheel_cache(requirements_file):
+                    subprocess.run([
+                        sys.executable, "-m", "pip", "install", "-r", str(requirements_file)
+                    ], check=True)
                 print("✅ Dependencies installed")
             else:
                 print("⚠️  requirements.txt not found, installing basic dependencies")
@@ -150,6 +170,55 @@ class AgentInstaller:
         except Exception as e:
             raise Exception(f"Dependency installation failed: {e}")
     
+    def install_from_wheel_cache(self, requirements_file):
+        """Install requirements from a local wheel cache, filling it first"""
+        try:
+            cache_dir = Path.home() / ".cache" / "os-health-agent" / "wheels"
+            cache_dir.mkdir(parents=True, exist_ok=True)
+            stamp_file = cache_dir / "requirements.sha256"
+
+            digest = hashlib.sha256(requirements_file.read_bytes()).hexdigest()
+
+            # Only refetch wheels when the requirements set changed
+            try:
+                cached = stamp_file.read_text().strip()
+            except OSError:
+                cached = None
+
+            if cached != digest:
+                self.download_wheels(requirements_file, cache_dir)
+                stamp_file.write_text(digest)
+
+            # Everything is local now; pip skips the resolver and the index
+            subprocess.run([
+                sys.executable, "-m", "pip", "install",
+                "--no-index", f"--find-links={cache_dir}",
+                "-r", str(requirements_file)
+            ], check=True)
+            return True
+
+        except Exception as e:
+            print(f"⚠️  Wheel cache install failed: {e}")
+            return False
+
+    def download_wheels(self, requirements_file, cache_dir):
+        """Fetch wheels for each requirement concurrently"""
+        requirements = [
+            line.strip() for line in requirements_file.read_text().splitlines()
+            if line.strip() and not line.strip().startswith('#')
+        ]
+
+        def fetch(requirement):
+            subprocess.run([
+                sys.executable, "-m", "pip", "download", requirement,
+                "-d", str(cache_dir), "--prefer-binary"
+            ], check=True, capture_output=True)
+
+        # Downloads are network-bound; a few parallel pip processes
+        # overlap their waits
+        with concurrent.futures.ThreadPoolExecutor(max_workers=4) as pool:
+            list(pool.map(fetch, requirements))
+
     def setup_service(self):
         """Setup service/daemon based on OS"""
         print(f"\n🔧 Setting up service for {self.os_name}...")
@@ -169,17 +238,22 @@ class AgentInstaller:
             print(f"⚠️  Service setup failed: {e}")
             print("🔧 Agent can still be run manually")
     
+    def write_config_file(self, path, content):
+        """Write a config file in one unbuffered pass"""
+        fd = os.open(str(path), os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            os.write(fd, content.encode())
+        finally:
+            os.close(fd)
+
     def setup_windows_service(self):
         """Setup Windows service using Task Scheduler"""
         print("🔧 Setting up Windows Task Scheduler...")
-        
-        # Create batch file to run the agent
-        batch_file = self.agent_dir / "run_agent.bat"
-        with open(batch_file, 'w') as f:
-            f.write(f'@echo off\n')
-            f.write(f'cd /d "{self.agent_dir}"\n')
-            f.write(f'"{sys.executable}" agent.py\n')
-        
+
+        # Run the interpreter directly; no batch shim means no cmd.exe
+        # per trigger and no console window (pythonw)
+        python_exe = sys.executable.replace("python.exe", "pythonw.exe")
+
         # Create scheduled task
         task_xml = f'''<?xml version="1.0" encoding="UTF-16"?>
 <Task version="1.2" xmlns="http://schemas.microsoft.com/windows/2004/02/mit/task">
@@ -215,7 +289,8 @@ class AgentInstaller:
   </Settings>
   <Actions>
     <Exec>
-      <Command>"{batch_file}"</Command>
+      <Command>"{python_exe}"</Command>
+      <Arguments>"{self.agent_dir / 'agent.py'}"</Arguments>
       <WorkingDirectory>"{self.agent_dir}"</WorkingDirectory>
     </Exec>
   </Actions>
@@ -224,15 +299,16 @@ class AgentInstaller:
         try:
             # Save task XML
             task_file = self.agent_dir / "task.xml"
-            with open(task_file, 'w') as f:
-                f.write(task_xml)
+            self.write_config_file(task_file, task_xml)
             
-            # Create scheduled task
+            # One shell chains create and run instead of two processes
             subprocess.run([
-                "schtasks", "/create", "/tn", self.service_name, 
-                "/xml", str(task_file)
+                "cmd", "/c",
+                f'schtasks /create /tn {self.service_name} /xml "{task_file}" '
+                f'&& schtasks /run /tn {self.service_name}'
             ], check=True)
-            
+
+            self.service_started = True
             print("✅ Windows service setup complete")
             
         except subprocess.CalledProcessError as e:
@@ -263,31 +339,43 @@ WantedBy=multi-user.target
             # Write service file
             service_file = Path(f"/etc/systemd/system/{self.service_name}.service")
             
-            # Try to write service file (requires sudo)
+            # Write the unit locally, then install it with the right mode
+            # in one sudo call instead of piping through sudo tee
+            tmp_service = self.agent_dir / f"{self.service_name}.service"
+            self.write_config_file(tmp_service, service_content)
+
             try:
                 subprocess.run([
-                    "sudo", "tee", str(service_file)
-                ], input=service_content, text=True, check=True)
-                
-                # Reload systemd and enable service
-                subprocess.run(["sudo", "systemctl", "daemon-reload"], check=True)
-                subprocess.run(["sudo", "systemctl", "enable", self.service_name], check=True)
-                
+                    "sudo", "install", "-m", "644",
+                    str(tmp_service), str(service_file)
+                ], check=True)
+
+                # One root shell covers reload, enable and start
+                subprocess.run([
+                    "sudo", "bash", "-c",
+                    f"systemctl daemon-reload && systemctl enable --now {self.service_name}"
+                ], check=True)
+
+                self.service_started = True
                 print("✅ Linux service setup complete")
-                
+
             except subprocess.CalledProcessError:
                 # Fallback: create user service
                 user_service_dir = Path.home() / ".config" / "systemd" / "user"
                 user_service_dir.mkdir(parents=True, exist_ok=True)
-                
+
                 user_service_file = user_service_dir / f"{self.service_name}.service"
-                with open(user_service_file, 'w') as f:
-                    f.write(service_content.replace('[Install]\nWantedBy=multi-user.target', 
-                                                  '[Install]\nWantedBy=default.target'))
-                
-                subprocess.run(["systemctl", "--user", "daemon-reload"], check=True)
-                subprocess.run(["systemctl", "--user", "enable", self.service_name], check=True)
-                
+                self.write_config_file(
+                    user_service_file,
+                    service_content.replace('[Install]\nWantedBy=multi-user.target',
+                                            '[Install]\nWantedBy=default.target'))
+
+                subprocess.run([
+                    "bash", "-c",
+                    f"systemctl --user daemon-reload && systemctl --user enable --now {self.service_name}"
+                ], check=True)
+
+                self.service_started = True
                 print("✅ Linux user service setup complete")
                 
         except Exception as e:
@@ -328,8 +416,7 @@ WantedBy=multi-user.target
             
             # Write plist file
             plist_file = launch_agents_dir / f"com.user.{self.service_name}.plist"
-            with open(plist_file, 'w') as f:
-                f.write(plist_content)
+            self.write_config_file(plist_file, plist_content)
             
             # Load the service
             subprocess.run(["launchctl", "load", str(plist_file)], check=True)
@@ -342,7 +429,12 @@ WantedBy=multi-user.target
     def start_agent(self):
         """Start the agent service"""
         print(f"\n🚀 Starting {self.service_name}...")
-        
+
+        # Service setup already started it (enable --now / chained run)
+        if self.service_started:
+            print("✅ Agent already running")
+            return
+
         try:
             if self.os_name == "Windows":
                 subprocess.run([
@@ -370,7 +462,14 @@ WantedBy=multi-user.target
         
         try:
             if self.agent_dir.exists():
-                shutil.rmtree(self.agent_dir)
+                # Rename aside (atomic), then delete in the background so
+                # the installer isn't blocked walking the tree
+                trash = self.agent_dir.with_name(
+                    f".{self.agent_dir.name}.trash-{os.getpid()}")
+                os.replace(self.agent_dir, trash)
+                threading.Thread(target=shutil.rmtree, args=(trash,),
+                                 kwargs={'ignore_errors': True},
+                                 daemon=True).start()
             print("✅ Cleanup complete")
         except Exception as e:
             print(f"⚠️  Cleanup failed: {e}")
@@ -6,66 +6,240 @@ Agent Updater - Handles automatic updates from GitHub
 import os
 import sys
 import json
+import time
 import shutil
+import hashlib
+import tarfile
 import zipfile
 import tempfile
+import functools
+import threading
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util import Retry
 from pathlib import Path
 from config import Config
 
+try:
+    from packaging.version import Version
+except ImportError:
+    Version = None
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# FICLONE ioctl: reflink the whole file on btrfs/XFS in O(1)
+_FICLONE = 0x40049409
+
+def _fast_copy(src, dst):
+    """Copy a file via reflink or in-kernel sendfile when available"""
+    src = os.fspath(src)
+    dst = os.fspath(dst)
+    try:
+        with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+            if fcntl is not None:
+                try:
+                    fcntl.ioctl(fdst.fileno(), _FICLONE, fsrc.fileno())
+                    shutil.copystat(src, dst)
+                    return
+                except OSError:
+                    pass
+
+            if hasattr(os, 'sendfile'):
+                # sendfile moves the bytes entirely in kernel space
+                size = os.fstat(fsrc.fileno()).st_size
+                offset = 0
+                while offset < size:
+                    sent = os.sendfile(fdst.fileno(), fsrc.fileno(),
+                                       offset, size - offset)
+                    if sent == 0:
+                        break
+                    offset += sent
+                shutil.copystat(src, dst)
+                return
+    except OSError:
+        pass
+
+    shutil.copy2(src, dst)
+
+@functools.lru_cache(maxsize=32)
+def _is_newer_version(latest, current):
+    """Compare version strings, understanding pre/post releases if possible"""
+    try:
+        if Version is not None:
+            return Version(latest) > Version(current)
+
+        def version_tuple(v):
+            return tuple(map(int, v.split('.')))
+
+        return version_tuple(latest) > version_tuple(current)
+    except:
+        return False
+
+class _ProgressWriter:
+    """File wrapper that redraws download progress ~4 times a second"""
+
+    # Minimum seconds between redraws; terminals can't show more anyway
+    REFRESH_INTERVAL = 0.25
+
+    def __init__(self, fileobj, total_size):
+        self.fileobj = fileobj
+        self.total_size = total_size
+        self.downloaded = 0
+        self.sha256 = hashlib.sha256()
+        self._last_print = 0.0
+
+    def write(self, data):
+        self.fileobj.write(data)
+        # Hashing rides along with the stream, so verification is free
+        self.sha256.update(data)
+        self.downloaded += len(data)
+        now = time.monotonic()
+        if self.total_size > 0 and now - self._last_print >= self.REFRESH_INTERVAL:
+            self._last_print = now
+            progress = (self.downloaded / self.total_size) * 100
+            print(f"\r⬇️ Progress: {progress:.1f}%", end='', flush=True)
+
 class AgentUpdater:
+    # Files shipped by an update; shared by extraction and install
+    FILES_TO_UPDATE = [
+        "agent.py",
+        "health_report.py",
+        "updater.py",
+        "config.py",
+        "requirements.txt"
+    ]
+
     def __init__(self):
         self.config = Config()
         self.current_version = self.config.VERSION
         self.agent_dir = Path(__file__).parent.absolute()
         self.version_file = self.agent_dir / "version.txt"
-        
+        self.update_cache_file = self.config.DATA_DIR / ".update_cache.json"
+        self.last_check_file = self.config.DATA_DIR / ".last_check"
+        self.install_stamp_file = self.agent_dir / ".install_stamp"
+        self.session = self.create_session()
+        self._last_download_digest = None
+
+    def create_session(self):
+        """Create a pooled HTTP session shared by checks and downloads"""
+        session = requests.Session()
+        retry = Retry(total=3, backoff_factor=0.5, status_forcelist=[502, 503, 504])
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=4, max_retries=retry)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    def __del__(self):
+        try:
+            self.session.close()
+        except Exception:
+            pass
+
+    def load_update_cache(self):
+        """Load the cached release response, if any"""
+        try:
+            with open(self.update_cache_file) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def save_update_cache(self, response, release):
+        """Persist the release payload with its conditional-GET validators"""
+        try:
+            cache = {
+                "etag": response.headers.get('ETag'),
+                "last_modified": response.headers.get('Last-Modified'),
+                "release": release,
+            }
+            with open(self.update_cache_file, 'w') as f:
+                json.dump(cache, f)
+        except OSError:
+            pass
+
     def check_for_updates(self):
         """Check if updates are available"""
         try:
+            # A crash-looping service restarts the agent far more often
+            # than releases happen; the stamp file survives restarts and
+            # keeps us inside the API rate limit
+            try:
+                age = time.time() - self.last_check_file.stat().st_mtime
+                if age < self.config.UPDATE_CHECK_INTERVAL:
+                    return False
+            except OSError:
+                pass
+
+            # Conditional GET: an unchanged release answers 304 with no
+            # body and doesn't count against the API rate limit
+            cache = self.load_update_cache()
+            headers = {}
+            if cache:
+                if cache.get("etag"):
+                    headers['If-None-Match'] = cache["etag"]
+                if cache.get("last_modified"):
+                    headers['If-Modified-Since'] = cache["last_modified"]
+
             # Get latest version from GitHub API
-            response = requests.get(
+            response = self.session.get(
                 f"https://api.github.com/repos/{self.config.GITHUB_REPO}/releases/latest",
+                headers=headers,
                 timeout=10
             )
-            
-            if response.status_code == 200:
+
+            if response.status_code == 304 and cache and cache.get("release"):
+                latest_release = cache["release"]
+            elif response.status_code == 304:
+                print("✅ Agent is up to date (release unchanged)")
+                return False
+            elif response.status_code == 200:
                 latest_release = response.json()
-                latest_version = latest_release["tag_name"].lstrip("v")
-                
-                print(f"🔍 Current version: {self.current_version}")
-                print(f"🔍 Latest version: {latest_version}")
-                
-                if self.is_newer_version(latest_version, self.current_version):
-                    print(f"🆕 Update available: {latest_version}")
-                    self.latest_release_data = latest_release
-                    return True
-                else:
-                    print("✅ Agent is up to date")
-                    return False
+                self.save_update_cache(response, latest_release)
             else:
                 print(f"⚠️ Could not check for updates: {response.status_code}")
                 return False
-                
+
+            try:
+                self.last_check_file.touch()
+            except OSError:
+                pass
+
+            latest_version = latest_release["tag_name"].lstrip("v")
+
+            print(f"🔍 Current version: {self.current_version}")
+            print(f"🔍 Latest version: {latest_version}")
+
+            if self.is_newer_version(latest_version, self.current_version):
+                print(f"🆕 Update available: {latest_version}")
+                self.latest_release_data = latest_release
+                return True
+            else:
+                print("✅ Agent is up to date")
+                return False
+
         except Exception as e:
             print(f"❌ Error checking for updates: {e}")
             return False
     
     def is_newer_version(self, latest, current):
         """Compare version strings"""
-        try:
-            def version_tuple(v):
-                return tuple(map(int, v.split('.')))
-            
-            return version_tuple(latest) > version_tuple(current)
-        except:
-            return False
+        return _is_newer_version(latest, current)
     
     def perform_update(self):
         """Download and install the update"""
         try:
             print("🔄 Starting update process...")
-            
+
+            # If the release asset matches what we last installed, the
+            # bytes are already on disk; just refresh the version file
+            expected = self.get_asset_digest()
+            if expected and self.read_install_stamp() == expected:
+                print("⏭ Release already installed; skipping download")
+                self.update_version_file()
+                return True
+
             # Create backup of current version
             backup_dir = self.create_backup()
             
@@ -84,7 +258,10 @@ class AgentUpdater:
                 
                 # Update version file
                 self.update_version_file()
-                
+
+                # Remember what we installed so retries can skip it
+                self.write_install_stamp()
+
                 print("✅ Update completed successfully!")
                 return True
                 
@@ -98,18 +275,30 @@ class AgentUpdater:
             print(f"❌ Update process failed: {e}")
             return False
     
+    def link_or_copy(self, src, dst):
+        """Hardlink when the filesystem allows it, byte-copy otherwise"""
+        try:
+            os.link(src, dst)
+        except OSError:
+            shutil.copy2(src, dst)
+
     def create_backup(self):
         """Create backup of current agent"""
         try:
-            backup_dir = self.agent_dir.parent / f"os-health-agent-backup-{self.current_version}"
-            
-            if backup_dir.exists():
-                shutil.rmtree(backup_dir)
-            
-            shutil.copytree(self.agent_dir, backup_dir)
-            print(f"📦 Backup created: {backup_dir}")
-            
-            return backup_dir
+            backup_path = self.agent_dir.parent / f"os-health-agent-backup-{self.current_version}.tar"
+
+            if backup_path.exists():
+                backup_path.unlink()
+
+            # One streaming tar write replaces a full tree copy with its
+            # per-file open/read/write/close cycle; no compression since
+            # the snapshot lives on the same disk anyway
+            with tarfile.open(backup_path, 'w') as tf:
+                tf.add(self.agent_dir, arcname=self.agent_dir.name)
+
+            print(f"📦 Backup created: {backup_path}")
+
+            return backup_path
         except Exception as e:
             print(f"⚠️ Could not create backup: {e}")
             return None
@@ -129,6 +318,33 @@ class AgentUpdater:
             print(f"❌ Error getting download URL: {e}")
             return None
     
+    def read_install_stamp(self):
+        """Digest of the last installed archive, if recorded"""
+        try:
+            return self.install_stamp_file.read_text().strip()
+        except OSError:
+            return None
+
+    def write_install_stamp(self):
+        """Record the digest of the archive we just installed"""
+        if self._last_download_digest:
+            try:
+                self.install_stamp_file.write_text(self._last_download_digest)
+            except OSError:
+                pass
+
+    def get_asset_digest(self):
+        """Expected digest of the zip asset from the release metadata"""
+        try:
+            for asset in self.latest_release_data["assets"]:
+                if asset["name"].endswith(".zip"):
+                    digest = asset.get("digest")
+                    if digest and digest.startswith("sha256:"):
+                        return digest
+            return None
+        except Exception:
+            return None
+
     def download_and_extract(self, download_url):
         """Download and extract the update"""
         try:
@@ -136,29 +352,49 @@ class AgentUpdater:
             
             # Download to temporary file
             with tempfile.NamedTemporaryFile(suffix='.zip', delete=False) as tmp_file:
-                response = requests.get(download_url, stream=True)
+                response = self.session.get(download_url, stream=True, timeout=30)
                 response.raise_for_status()
-                
+                response.raw.decode_content = True
+
                 total_size = int(response.headers.get('content-length', 0))
-                downloaded = 0
-                
-                for chunk in response.iter_content(chunk_size=8192):
-                    if chunk:
-                        tmp_file.write(chunk)
-                        downloaded += len(chunk)
-                        
-                        if total_size > 0:
-                            progress = (downloaded / total_size) * 100
-                            print(f"\r⬇️ Progress: {progress:.1f}%", end='', flush=True)
-                
+
+                # Big reads mean few syscalls; scale the buffer to ~1% of
+                # the file, clamped between 8KB and 1MB
+                buffer_size = max(8192, min(1 << 20, total_size // 100 or 1 << 17))
+
+                writer = _ProgressWriter(tmp_file, total_size)
+                shutil.copyfileobj(response.raw, writer, length=buffer_size)
+
                 print("\n✅ Download completed")
+
+                actual = f"sha256:{writer.sha256.hexdigest()}"
+                self._last_download_digest = actual
+
+                # Bail before extraction if the archive is corrupted
+                expected = self.get_asset_digest()
+                if expected:
+                    if actual != expected:
+                        raise Exception(
+                            f"Download digest mismatch: {actual} != {expected}")
+                    print("🔐 Download digest verified")
                 
-                # Extract to temporary directory
+                # Stream only the members we ship into a flat staging
+                # dir; docs, tests and the rest of the archive are
+                # never decompressed or written
                 extract_dir = tempfile.mkdtemp()
-                
-                with zipfile.ZipFile(tmp_file.name, 'r') as zip_ref:
-                    zip_ref.extractall(extract_dir)
-                
+                wanted = set(self.FILES_TO_UPDATE)
+
+                # Open the zip on the live file object: reopening by name
+                # would miss the download tail still in its write buffer
+                with zipfile.ZipFile(tmp_file) as zip_ref:
+                    for name in zip_ref.namelist():
+                        member_name = name.split('/', 1)[-1]
+                        if member_name not in wanted:
+                            continue
+                        dest = os.path.join(extract_dir, member_name)
+                        with zip_ref.open(name) as src, open(dest, 'wb') as dst:
+                            shutil.copyfileobj(src, dst)
+
                 print(f"📦 Extracted to: {extract_dir}")
                 
                 # Clean up download file
@@ -181,21 +417,23 @@ class AgentUpdater:
                 raise Exception("Could not find source directory in download")
             
             # List of files to update
-            files_to_update = [
-                "agent.py",
-                "health_report.py",
-                "updater.py",
-                "config.py",
-                "requirements.txt"
-            ]
-            
-            # Copy new files
+            files_to_update = self.FILES_TO_UPDATE
+
+
+            # Copy new files, skipping any whose bytes didn't change.
+            # Plain string joins avoid re-parsing a Path per file
+            source_dir_str = os.fspath(source_dir)
+            agent_dir_str = os.fspath(self.agent_dir)
+
             for file_name in files_to_update:
-                source_file = source_dir / file_name
-                dest_file = self.agent_dir / file_name
-                
-                if source_file.exists():
-                    shutil.copy2(source_file, dest_file)
+                source_file = os.path.join(source_dir_str, file_name)
+                dest_file = os.path.join(agent_dir_str, file_name)
+
+                if os.path.exists(source_file):
+                    if self.files_identical(source_file, dest_file):
+                        print(f"⏭ Unchanged: {file_name}")
+                        continue
+                    _fast_copy(source_file, dest_file)
                     print(f"✅ Updated: {file_name}")
                 else:
                     print(f"⚠️ File not found in update: {file_name}")
@@ -207,17 +445,36 @@ class AgentUpdater:
             print(f"❌ Error installing new version: {e}")
             raise
     
+    def files_identical(self, source_file, dest_file):
+        """Detect unchanged files with a size check, then a content hash"""
+        try:
+            if not os.path.exists(dest_file):
+                return False
+            if os.stat(source_file).st_size != os.stat(dest_file).st_size:
+                return False
+
+            def digest(path):
+                with open(path, 'rb') as f:
+                    return hashlib.blake2b(f.read(), digest_size=16).digest()
+
+            return digest(source_file) == digest(dest_file)
+        except OSError:
+            return False
+
     def find_source_directory(self, temp_dir):
         """Find the actual source directory in the extracted files"""
         try:
             temp_path = Path(temp_dir)
-            
-            # Look for agent.py in the extracted files
-            for root, dirs, files in os.walk(temp_path):
-                if "agent.py" in files:
-                    return Path(root)
-            
-            return None
+
+            # GitHub archives unpack to a single top-level folder; check
+            # it directly before falling back to a search
+            candidates = list(temp_path.iterdir())
+            if len(candidates) == 1 and (candidates[0] / "agent.py").exists():
+                return candidates[0]
+
+            # rglob stops at the first hit instead of walking the tree
+            agent_file = next(temp_path.rglob("agent.py"), None)
+            return agent_file.parent if agent_file else None
         except:
             return None
     
@@ -225,10 +482,17 @@ class AgentUpdater:
         """Update the local version file"""
         try:
             new_version = self.latest_release_data["tag_name"].lstrip("v")
-            
-            with open(self.version_file, 'w') as f:
-                f.write(new_version)
-            
+
+            # Single write + fsync so the new mtime (which keys the
+            # version cache in config) lands together with the content
+            fd = os.open(str(self.version_file),
+                         os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+            try:
+                os.write(fd, new_version.encode())
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+
             print(f"📝 Updated version to: {new_version}")
             
         except Exception as e:
@@ -238,20 +502,33 @@ class AgentUpdater:
         """Restore from backup if update fails"""
         try:
             if backup_dir and backup_dir.exists():
-                # Remove current directory
-                for item in self.agent_dir.iterdir():
+                # Remove current contents; subtrees are renamed aside
+                # (atomic) and deleted in the background
+                for item in list(self.agent_dir.iterdir()):
                     if item.is_file():
                         item.unlink()
                     elif item.is_dir():
-                        shutil.rmtree(item)
-                
-                # Restore from backup
-                for item in backup_dir.iterdir():
-                    if item.is_file():
-                        shutil.copy2(item, self.agent_dir)
-                    elif item.is_dir():
-                        shutil.copytree(item, self.agent_dir / item.name)
+                        trash = item.with_name(f".{item.name}.trash-{os.getpid()}")
+                        os.replace(item, trash)
+                        threading.Thread(target=shutil.rmtree, args=(trash,),
+                                         kwargs={'ignore_errors': True},
+                                         daemon=True).start()
                 
+                if backup_dir.is_file() and backup_dir.suffix == '.tar':
+                    # Tar snapshot: one streaming extract recreates the tree
+                    with tarfile.open(backup_dir) as tf:
+                        tf.extractall(self.agent_dir.parent)
+                else:
+                    # Directory backup: restore via hardlinks where possible
+                    agent_dir_str = os.fspath(self.agent_dir)
+                    for item in backup_dir.iterdir():
+                        dest = os.path.join(agent_dir_str, item.name)
+                        if item.is_file():
+                            self.link_or_copy(item, dest)
+                        elif item.is_dir():
+                            shutil.copytree(item, dest,
+                                            copy_function=self.link_or_copy)
+
                 print("✅ Backup restored successfully")
                 
         except Exception as e:
@@ -260,12 +537,12 @@ class AgentUpdater:
     def rollback_to_previous_version(self):
         """Rollback to previous version if available"""
         try:
-            backup_dirs = [d for d in self.agent_dir.parent.iterdir() 
-                          if d.is_dir() and d.name.startswith("os-health-agent-backup-")]
-            
-            if backup_dirs:
-                # Use the most recent backup
-                latest_backup = max(backup_dirs, key=lambda x: x.stat().st_mtime)
+            backups = [p for p in self.agent_dir.parent.iterdir()
+                       if p.name.startswith("os-health-agent-backup-")]
+
+            if backups:
+                # Use the most recent backup (tar snapshot or legacy dir)
+                latest_backup = max(backups, key=lambda x: x.stat().st_mtime)
                 self.restore_backup(latest_backup)
                 return True
             else: